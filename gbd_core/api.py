@@ -134,10 +134,11 @@ class GBD:
                 for hashes_slice in util.slice_iterator(hashes, 10):
                     self.database.delete(feature, values_slice, hashes_slice, target_db)
         elif len(values):
-            for values_slice in util.slice_iterator(values, 10):
+            # slices stay below sqlite's default limit of 999 bound parameters per statement
+            for values_slice in util.slice_iterator(values, 400):
                 self.database.delete(feature, values_slice, [], target_db)
         elif len(hashes):
-            for hashes_slice in util.slice_iterator(hashes, 10):
+            for hashes_slice in util.slice_iterator(hashes, 400):
                 self.database.delete(feature, [], hashes_slice, target_db)
 
 
@@ -206,14 +207,16 @@ class GBD:
         """ Retrieve information about a specific feature"""
         finfo = self.database.find(fname)
         df = self.query(resolve=[ fname ], collapse=None)
-        numcol = df[fname].apply(lambda x: pd.to_numeric(x, errors = 'coerce'))
+        # min, max and symbolic values are determined on the distinct values only
+        values = df[fname].unique()
+        numcol = pd.to_numeric(pd.Series(values, dtype=object), errors = 'coerce')
         return {
             'feature_name': fname,
             'feature_count': len(df.index),
             'feature_default': finfo.default,
             'feature_min': numcol.min(),
             'feature_max': numcol.max(),
-            'feature_values': " ".join([ val for val in df[fname].unique() if val and not util.is_number(val) ])
+            'feature_values': " ".join([ val for val in values if val and not util.is_number(val) ])
         }
 
     
@@ -13,6 +13,8 @@
 # The above copyright notice and this permission notice shall be included in all
 # copies or substantial portions of the Software.
 
+import functools
+
 from gbd_init.gbdhash import cnf_hash, opb_hash, wcnf_hash
 
 ### Default Context
@@ -55,9 +57,10 @@ config = {
 def description(context):
     return config[context]['description']
 
+@functools.lru_cache(maxsize=4096)
 def suffixes(context):
     packed = [ "", ".gz", ".lzma", ".xz", ".bz2" ]
-    return [ config[context]['suffix'] + p for p in packed ]
+    return tuple([ config[context]['suffix'] + p for p in packed ])
 
 def idfunc(context):
     return config[context]['idfunc']
@@ -70,9 +73,8 @@ def default_context():
 
 def get_context_by_suffix(benchmark):
     for context in contexts():
-        for suffix in suffixes(context):
-            if benchmark.endswith(suffix):
-                return context
+        if benchmark.endswith(suffixes(context)):
+            return context
     return None
 
 def identify(path, ct=None):
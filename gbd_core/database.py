@@ -15,10 +15,13 @@
 
 import sqlite3
 import typing
+import re
 
+from contextlib import contextmanager
 from pprint import pprint
 
 from gbd_core.util import eprint
+from gbd_core import util
 from gbd_core.schema import Schema, FeatureInfo
 from gbd_core import contexts
 
@@ -35,23 +38,88 @@ class Database:
         self.features = self.init_features()
         self.connection = sqlite3.connect("file::memory:?cache=shared", uri=True, timeout=10)
         self.cursor = self.connection.cursor()
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
         self.maindb = None
         self.autocommit = autocommit
         schema: Schema
         for schema in self.schemas.values():
+            # schema names cannot be bound as parameters, paths can:
+            if not re.match("^[A-Za-z_][A-Za-z0-9_]*$", schema.dbname):
+                raise DatabaseException("Invalid database name '{}'".format(schema.dbname))
             if not schema.is_in_memory():
-                self.execute("ATTACH DATABASE '{}' AS {}".format(schema.path, schema.dbname))
+                self.execute("ATTACH DATABASE ? AS {}".format(schema.dbname), (schema.path, ))
+                self.tune(schema)
             else:
-                self.execute("ATTACH DATABASE 'file:{}?mode=memory&cache=shared' AS {}".format(schema.dbname, schema.dbname))
+                self.execute("ATTACH DATABASE ? AS {}".format(schema.dbname), ("file:{}?mode=memory&cache=shared".format(schema.dbname), ))
             # first database is the default database:
             if not self.maindb:
                 self.maindb = schema.dbname
-        
+
+    # per-connection performance settings for attached file databases, the persistent journal mode is left untouched
+    def tune(self, schema: Schema):
+        db = schema.dbname
+        self.cursor.execute("PRAGMA {}.synchronous=NORMAL".format(db))
+        self.cursor.execute("PRAGMA {}.cache_size=-64000".format(db))
+        if sqlite3.sqlite_version_info >= (3, 7, 17):
+            self.cursor.execute("PRAGMA {}.mmap_size=268435456".format(db))
+
+    # opt-in write-ahead log for write-heavy sessions (e.g., feature extraction)
+    # the previous journal mode is restored on exit, busy or network databases keep their journal mode
+    @contextmanager
+    def write_ahead_log(self, dbname: str):
+        schema = self.schemas[dbname]
+        previous = None
+        if not schema.is_in_memory() and schema.is_writable() and not util.is_network_fs(schema.path):
+            current = self.journal_mode(dbname)
+            if current and current != "wal" and self.journal_mode(dbname, "WAL") == "wal":
+                previous = current
+        try:
+            yield
+        finally:
+            if previous:
+                # leaving wal mode needs exclusive access, so the schema connection must let go of the wal index
+                self.commit()
+                schema.close()
+                try:
+                    if self.journal_mode(dbname, previous) != previous and self.verbose:
+                        eprint("Database {} is busy and remains in write-ahead log mode".format(dbname))
+                finally:
+                    schema.reopen()
+
+    # queries (mode=None) or sets the journal mode without waiting for locks, returns the journal mode in effect
+    def journal_mode(self, dbname: str, mode=None):
+        self.cursor.execute("PRAGMA busy_timeout=0")
+        try:
+            result = self.cursor.execute("PRAGMA {}.journal_mode{}".format(dbname, "=" + mode if mode else "")).fetchall()
+            return result[0][0].lower() if result else None
+        except sqlite3.OperationalError:
+            return None if mode is None else self.journal_mode(dbname)
+        finally:
+            self.cursor.execute("PRAGMA busy_timeout=10000")
+
+    # update query planner statistics, mask 0x10002 analyzes all tables (e.g., after bulk inserts)
+    def optimize(self, mask=None):
+        for schema in self.schemas.values():
+            if schema.is_writable():
+                try:
+                    self.cursor.execute("PRAGMA {}.optimize{}".format(schema.dbname, "({})".format(mask) if mask else "")).fetchall()
+                except sqlite3.OperationalError as e:
+                    if self.verbose:
+                        eprint("Skipping optimize for {}: {}".format(schema.dbname, e))
+
     def __enter__(self):
         return self
 
     def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def close(self):
+        self.optimize()
         self.connection.commit()
+        schema: Schema
+        for schema in self.schemas.values():
+            if not schema.is_in_memory():
+                schema.close()
         self.connection.close()
 
 
@@ -95,21 +163,45 @@ class Database:
         return result
 
 
-    def query(self, q):
+    def query(self, q, params=()):
+        if self.verbose:
+            eprint(q)
+        return self.cursor.execute(q, params).fetchall()
+
+    def execute(self, q, params=()):
         if self.verbose:
             eprint(q)
-        return self.cursor.execute(q).fetchall()
+        self.cursor.execute(q, params)
+        if self.autocommit:
+            self.commit()
 
-    def execute(self, q):
+    def executemany(self, q, seq_of_params):
         if self.verbose:
             eprint(q)
-        self.cursor.execute(q)
+        self.cursor.executemany(q, seq_of_params)
         if self.autocommit:
             self.commit()
 
     def commit(self):
         self.connection.commit()
 
+    # group several statements into one transaction (committed at the end if autocommit is enabled)
+    @contextmanager
+    def transaction(self):
+        autocommit = self.autocommit
+        self.autocommit = False
+        try:
+            yield self
+        except BaseException:
+            if autocommit:
+                self.connection.rollback()
+            raise
+        else:
+            if autocommit:
+                self.commit()
+        finally:
+            self.autocommit = autocommit
+
     def set_auto_commit(self, autocommit):
         self.autocommit = autocommit
 
@@ -233,16 +325,17 @@ class Database:
         finfo = self.finfo(fname, target_db)
         self.schemas[finfo.database].set_values(fname, value, hashes)
 
+    def insert_values(self, fname, rows, target_db=None):
+        finfo = self.finfo(fname, target_db)
+        self.schemas[finfo.database].insert_values(fname, rows)
+
 
     def rename_feature(self, fname, new_fname, target_db=None):
         Schema.valid_feature_or_raise(new_fname)
         finfo = self.finfo(fname, target_db)
         self.execute("ALTER TABLE {}.features RENAME COLUMN {} TO {}".format(finfo.database, fname, new_fname))
         if finfo.default is None:
-            con = sqlite3.connect(self.schemas[finfo.database].path)
-            with con as cursor:
-                cursor.execute("ALTER TABLE {} RENAME TO {}".format(fname, new_fname))
-            con.close()
+            self.schemas[finfo.database].execute("ALTER TABLE {} RENAME TO {}".format(fname, new_fname))
         self.features[fname].remove(finfo)
         if not len(self.features[fname]):
             del self.features[fname]
@@ -269,29 +362,33 @@ class Database:
 
     def delete(self, fname, values=[], hashes=[], target_db=None):
         finfo = self.finfo(fname, target_db)
-        w1 = "{cl} IN ('{v}')".format(cl=finfo.column, v="', '".join(values))
-        w2 = "hash IN ('{h}')".format(h="', '".join(hashes))
+        w1 = "{cl} IN ({p})".format(cl=finfo.column, p=", ".join("?" * len(values)))
+        w2 = "hash IN ({p})".format(p=", ".join("?" * len(hashes)))
         where = "{} AND {}".format(w1 if len(values) else "1=1", w2 if len(hashes) else "1=1")
+        params = list(values) + list(hashes)
         db = finfo.database
         if finfo.default is None:
-            hashlist = [ r[0] for r in self.query("SELECT DISTINCT(hash) FROM {d}.{tab} WHERE {w}".format(d=db, tab=fname, w=where)) ]
-            self.execute("DELETE FROM {d}.{tab} WHERE {w}".format(d=db, tab=fname, w=where))
-            remaining = [ r[0] for r in self.query("SELECT DISTINCT(hash) FROM {d}.{tab} WHERE hash in ('{h}')".format(d=db, tab=fname, h="', '".join(hashlist))) ]
-            setnone = [ h for h in hashlist if not h in remaining ]
-            self.execute("UPDATE {d}.features SET {col} = 'None' WHERE hash IN ('{h}')".format(d=db, col=fname, h="', '".join(setnone)))
+            # hashes which lose all their values are set to 'None' in the main table:
+            with self.transaction():
+                self.execute("UPDATE {d}.features SET {col} = 'None' WHERE hash IN (SELECT hash FROM {d}.{tab} WHERE {w}) AND hash NOT IN (SELECT hash FROM {d}.{tab} WHERE NOT ({w}))".format(d=db, col=fname, tab=fname, w=where), params + params)
+                self.execute("DELETE FROM {d}.{tab} WHERE {w}".format(d=db, tab=fname, w=where), params)
         else:
-            self.execute("UPDATE {d}.features SET {col} = '{default}' WHERE {w}".format(d=db, col=fname, default=finfo.default, w=where))
+            self.execute("UPDATE {d}.features SET {col} = ? WHERE {w}".format(d=db, col=fname, w=where), [ finfo.default ] + params)
 
 
     def delete_hashes_entirely(self, hashes, target_db=None):
         tables = self.get_tables([ target_db ])
-        for table in tables:
-            self.execute("DELETE FROM {}.{} WHERE hash IN ('{h}')".format(target_db, table, h="', '".join(hashes)))
+        with self.transaction():
+            for table in tables:
+                self.executemany("DELETE FROM {}.{} WHERE hash = ?".format(target_db, table), [ (hash, ) for hash in hashes ])
 
 
     def copy_feature(self, old_name, new_name, target_db, hashlist=[]):
         old_finfo = self.find(old_name)
-        data = self.query("SELECT hash, {col} FROM {d}.{tab} WHERE hash IN ('{h}')".format(d=old_finfo.database, col=old_finfo.column, tab=old_finfo.table, h="', '".join(hashlist)))
-        for (hash, value) in data:
-            self.set_values(new_name, value, [hash], target_db)
-
+        for hashes_slice in util.slice_iterator(hashlist, 500):
+            data = self.query("SELECT hash, {col} FROM {d}.{tab} WHERE hash IN ({p})".format(d=old_finfo.database, col=old_finfo.column, tab=old_finfo.table, p=", ".join("?" * len(hashes_slice))), hashes_slice)
+            hashes_by_value = dict()
+            for (hash, value) in data:
+                hashes_by_value.setdefault(value, []).append(hash)
+            for (value, hashes) in hashes_by_value.items():
+                self.set_values(new_name, value, hashes, target_db)
@@ -16,13 +16,15 @@
 import sqlite3
 import typing
 import os
+import stat
 import csv
 import re
+import functools
 
 from dataclasses import dataclass
 
 from gbd_core import contexts
-from gbd_core.util import eprint, confirm
+from gbd_core.util import eprint, confirm, slice_iterator
 
 
 class SchemaException(Exception):
@@ -48,14 +50,23 @@ class Schema:
         self.dbcon = dbcon
         self.csv = csv
 
+    # header check results by path, valid as long as size and mtime are unchanged (the server opens the databases for every request)
+    header_cache = dict()
+
     @classmethod
     def is_database(cls, path):
-        if os.path.isfile(path):
-            sz = os.path.getsize(path)
-            if sz == 0: return True  # new sqlite3 files can be empty
-            if sz < 100: return False  # sqlite header is 100 bytes
-            with open(path, 'rb') as fd: header = fd.read(100)  # validate header
-            return (header[:16] == b'SQLite format 3\x00')
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is not None and stat.S_ISREG(st.st_mode):
+            if st.st_size == 0: return True  # new sqlite3 files can be empty
+            if st.st_size < 100: return False  # sqlite header is 100 bytes
+            version = (st.st_size, st.st_mtime_ns)
+            if cls.header_cache.get(path, (None, ))[0] != version:
+                with open(path, 'rb', buffering=0) as fd: header = fd.read(16)  # validate magic string
+                cls.header_cache[path] = (version, header == b'SQLite format 3\x00')
+            return cls.header_cache[path][1]
         elif confirm("Database '{}' does not exist. Create new database?".format(path)): 
             sqlite3.connect(path).close()
             return True
@@ -76,6 +87,7 @@ class Schema:
     def from_database(cls, path):
         dbname = cls.dbname_from_path(path)
         con = sqlite3.connect(path)
+        con.execute("PRAGMA synchronous=NORMAL")
         features = cls.features_from_database(dbname, path, con)
         context = cls.context_from_database(dbname)
         return cls(con, dbname, path, features, context)
@@ -102,8 +114,14 @@ class Schema:
                 for colname in cols:
                     features[colname] = FeatureInfo(colname, dbname, "features", colname, None)
                 con.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format("features", ", ".join(cols)))
-                for row in csvreader:
-                    con.execute("INSERT INTO {} VALUES ('{}')".format("features", "', '".join(row.values())))
+                # one prepared statement for all rows, streamed in batches within a single transaction:
+                sql = "INSERT INTO {} VALUES ({})".format("features", ", ".join("?" * len(cols)))
+                rows = ( [ row[f] for f in csvreader.fieldnames ] for row in csvreader )
+                con.execute("BEGIN")
+                for n, batch in enumerate(slice_iterator(rows, 10000), 1):
+                    con.executemany(sql, batch)
+                    if n % 10 == 0:
+                        eprint("Imported {} rows from {}".format(n * 10000, path))
                 con.commit()
             else:
                 raise SchemaException("Column 'hash' not found in {}".format(csvfile))
@@ -113,17 +131,17 @@ class Schema:
     @classmethod
     def features_from_database(cls, dbname, path, con) -> typing.Dict[str, FeatureInfo]:
         features = dict()
-        sql_tables="SELECT tbl_name FROM sqlite_master WHERE type = 'table'"
-        tables = [ tab for (tab, ) in con.execute(sql_tables).fetchall() if not tab.startswith("_") ]
-        for table in tables:
-            columns = con.execute("PRAGMA table_info({})".format(table)).fetchall()
-            for (index, colname, coltype, notnull, default_value, pk) in columns:
-                is_fk_column = table == "features" and colname in tables
-                is_fk_hash = table != "features" and colname == "hash"
-                if not is_fk_column and not is_fk_hash:
-                    fname = colname if table == "features" else table
-                    dval = default_value.strip('"') if default_value else None
-                    features[fname] = FeatureInfo(fname, dbname, table, colname, dval)
+        sql_columns = """SELECT m.tbl_name, p.name, p.dflt_value FROM sqlite_master m JOIN pragma_table_info(m.tbl_name) p
+                            WHERE m.type = 'table' AND m.tbl_name NOT LIKE '\\_%' ESCAPE '\\' AND m.tbl_name NOT LIKE 'sqlite\\_%' ESCAPE '\\'"""
+        columns = con.execute(sql_columns).fetchall()
+        tables = set([ table for (table, colname, default_value) in columns ])
+        for (table, colname, default_value) in columns:
+            is_fk_column = table == "features" and colname in tables
+            is_fk_hash = table != "features" and colname == "hash"
+            if not is_fk_column and not is_fk_hash:
+                fname = colname if table == "features" else table
+                dval = default_value.strip('"') if default_value else None
+                features[fname] = FeatureInfo(fname, dbname, table, colname, dval)
         return features
 
     @classmethod
@@ -136,6 +154,7 @@ class Schema:
         return cls.context_from_name(Schema.dbname_from_path(path))
 
     @classmethod
+    @functools.lru_cache(maxsize=4096)
     def context_from_name(cls, name):
         pair = name.split('_')
         if len(pair) > 1 and pair[0] in contexts.contexts():
@@ -145,6 +164,7 @@ class Schema:
 
 
     @classmethod
+    @functools.lru_cache(maxsize=4096)
     def dbname_from_path(cls, path):
         filename = os.path.splitext(os.path.basename(path))[0]
         if filename[0].isdigit():
@@ -175,18 +195,29 @@ class Schema:
     def is_in_memory(self):
         return self.csv
 
-    def get_connection(self):
-        if self.is_in_memory():
-            return sqlite3.connect("file::memory:?cache=shared", uri=True)
-        else:
-            return sqlite3.connect(self.path)
+    def is_writable(self):
+        return not self.csv and os.access(self.path, os.W_OK) and os.access(os.path.dirname(os.path.abspath(self.path)), os.W_OK)
 
-    def execute(self, sql):
-        con = self.get_connection()
-        cur = con.cursor()
-        cur.execute(sql)
-        con.commit()
-        con.close()
+    def close(self):
+        self.dbcon.close()
+
+    # reopens the connection after close()
+    def reopen(self):
+        self.dbcon = sqlite3.connect(self.path)
+        self.dbcon.execute("PRAGMA synchronous=NORMAL")
+
+    def execute(self, sql, params=()):
+        self.dbcon.execute(sql, params)
+        self.dbcon.commit()
+
+    # run the given statements as one script within a single transaction
+    def execute_script(self, statements):
+        try:
+            self.dbcon.executescript("BEGIN;\n" + ";\n".join(statements) + ";\nCOMMIT;")
+        except sqlite3.Error:
+            if self.dbcon.in_transaction:
+                self.dbcon.rollback()
+            raise
 
 
     def get_tables(self):
@@ -208,12 +239,13 @@ class Schema:
     def create_main_table_if_not_exists(self):
         main_table = "features"
         if not main_table in self.get_tables():
-            self.execute("CREATE TABLE IF NOT EXISTS {} (hash UNIQUE NOT NULL)".format(main_table))
+            script = [ "CREATE TABLE IF NOT EXISTS {} (hash UNIQUE NOT NULL)".format(main_table) ]
             # insert all known hashes into main table and create triggers
             for table in [ t for t in self.get_tables() if t != main_table ]:
-                self.execute("INSERT OR IGNORE INTO {} (hash) SELECT DISTINCT(hash) FROM {}".format(main_table, table))
-                self.execute("""CREATE TRIGGER IF NOT EXISTS {}_dval AFTER INSERT ON {} 
+                script.append("INSERT OR IGNORE INTO {} (hash) SELECT DISTINCT(hash) FROM {}".format(main_table, table))
+                script.append("""CREATE TRIGGER IF NOT EXISTS {}_dval AFTER INSERT ON {} 
                                             BEGIN INSERT OR IGNORE INTO {} (hash) VALUES (NEW.hash); END""".format(table, table, main_table))
+            self.execute_script(script)
             self.features["hash"] = FeatureInfo("hash", self.dbname, main_table, "hash", None)
             return [ self.features["hash"] ]
         else:
@@ -232,16 +264,21 @@ class Schema:
 
             # create new feature:
             main_table = "features"
-            self.execute('ALTER TABLE {} ADD {} TEXT NOT NULL DEFAULT {}'.format(main_table, name, default_value or "None"))
+            script = [ 'ALTER TABLE {} ADD {} TEXT NOT NULL DEFAULT {}'.format(main_table, name, default_value or "None") ]
+            if default_value is None:
+                # feature is not unique and resides in a separate table (column in main features-table is a foreign key):
+                script.append("CREATE TABLE IF NOT EXISTS {} (hash TEXT NOT NULL, value TEXT NOT NULL, CONSTRAINT all_unique UNIQUE(hash, value))".format(name))
+                # lookups by hash use the unique (hash, value) index, lookups by value (e.g., of local paths) need their own:
+                script.append("CREATE INDEX IF NOT EXISTS {}_value ON {} (value)".format(name, name))
+                script.append("INSERT INTO {} (hash, value) VALUES ('None', 'None')".format(name))
+                script.append("""CREATE TRIGGER IF NOT EXISTS {}_hash AFTER INSERT ON {}
+                                    BEGIN INSERT OR IGNORE INTO {} (hash) VALUES (NEW.hash); END""".format(name, name, main_table))
+            self.execute_script(script)
+
             if default_value is not None:
                 # feature is unique and resides in main features-table:
                 self.features[name] = FeatureInfo(name, self.dbname, main_table, name, default_value)
             else:
-                # feature is not unique and resides in a separate table (column in main features-table is a foreign key):
-                self.execute("CREATE TABLE IF NOT EXISTS {} (hash TEXT NOT NULL, value TEXT NOT NULL, CONSTRAINT all_unique UNIQUE(hash, value))".format(name))
-                self.execute("INSERT INTO {} (hash, value) VALUES ('None', 'None')".format(name))
-                self.execute("""CREATE TRIGGER IF NOT EXISTS {}_hash AFTER INSERT ON {}
-                                    BEGIN INSERT OR IGNORE INTO {} (hash) VALUES (NEW.hash); END""".format(name, name, main_table))
                 self.features[name] = FeatureInfo(name, self.dbname, name, "value", None)
 
             # update schema:
@@ -250,20 +287,29 @@ class Schema:
         elif not permissive:
             raise SchemaException("Feature '{}' already exists".format(name))
 
+        elif not self.csv and self.features[name].default is None and self.features[name].table == name:
+            # tables created before the value index was introduced get it on their next (permissive) initialization
+            self.execute("CREATE INDEX IF NOT EXISTS {}_value ON {} (value)".format(name, name))
+
         return created
 
 
     def set_values(self, feature, value, hashes):
-        if not self.has_feature(feature):
-            raise SchemaException("Feature '{}' does not exist".format(feature))
         if not len(hashes):
             raise SchemaException("No hashes given")
+        self.insert_values(feature, [ (hash, value) for hash in hashes ])
+
+
+    # insert (hash, value) pairs of the given feature within one transaction
+    def insert_values(self, feature, rows):
+        if not self.has_feature(feature):
+            raise SchemaException("Feature '{}' does not exist".format(feature))
         table = self.features[feature].table
         column = self.features[feature].column
-        values = ', '.join(["('{}', '{}')".format(hash, value) for hash in hashes])
-        if self.features[feature].default is None:
-            self.execute("INSERT OR IGNORE INTO {tab} (hash, {col}) VALUES {vals}".format(tab=table, col=column, vals=values))
-            self.execute("UPDATE features SET {col}=hash WHERE hash in ('{h}')".format(col=table, h="', '".join(hashes)))
-        else:
-            self.execute("INSERT INTO {tab} (hash, {col}) VALUES {vals} ON CONFLICT (hash) DO UPDATE SET {col}='{val}' WHERE hash in ('{h}')".format(tab=table, col=column, val=value, vals=values, h="', '".join(hashes)))
-
+        rows = [ (hash, str(value)) for (hash, value) in rows ]
+        with self.dbcon as con:
+            if self.features[feature].default is None:
+                con.executemany("INSERT OR IGNORE INTO {tab} (hash, {col}) VALUES (?, ?)".format(tab=table, col=column), rows)
+                con.executemany("UPDATE features SET {col}=hash WHERE hash = ?".format(col=table), [ (hash, ) for (hash, value) in rows ])
+            else:
+                con.executemany("INSERT INTO {tab} (hash, {col}) VALUES (?, ?) ON CONFLICT (hash) DO UPDATE SET {col}=excluded.{col}".format(tab=table, col=column), rows)
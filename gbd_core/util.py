@@ -66,6 +66,40 @@ def slice_iterator(data, slice_len):
         yield items
 
 
+# recursively yield files below root which end with one of the given suffixes (skips hidden entries and unreadable directories like glob)
+def find_files(root, suffixes: tuple):
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    yield from find_files(entry.path, suffixes)
+                elif entry.name.endswith(suffixes) and entry.is_file():
+                    yield entry.path
+    except OSError:
+        return
+
+
+# best effort check (linux only) whether path is located on a network file system, where sqlite's write-ahead log is unsupported
+def is_network_fs(path):
+    network_types = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'ncpfs', 'afs', '9p', 'ceph', 'glusterfs', 'lustre', 'gpfs', 'beegfs', 'fuse.sshfs')
+    path = os.path.realpath(path)
+    fstype, mountpoint = None, ""
+    try:
+        with open("/proc/mounts") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount = fields[1].replace("\\040", " ")
+                if (path == mount or path.startswith(mount.rstrip('/') + '/')) and len(mount) >= len(mountpoint):
+                    fstype, mountpoint = fields[2], mount
+    except OSError:
+        return False
+    return fstype in network_types
+
+
 def is_number(s):
     try:
         if s is not None:
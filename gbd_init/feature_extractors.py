@@ -15,12 +15,13 @@
 
 import pandas as pd
 import os
-import glob
 import warnings
 
+from concurrent.futures import ThreadPoolExecutor
+
 from gbd_core.contexts import suffixes, identify, get_context_by_suffix
 from gbd_core.api import GBD, GBDException
-from gbd_core.util import eprint, confirm
+from gbd_core.util import eprint, confirm, find_files, slice_iterator
 from gbd_init.initializer import Initializer, InitializerException
 
 gbdc_available = True
@@ -169,9 +170,11 @@ def init_local(api: GBD, rlimits, root, target_db):
     extractor = Initializer(api, rlimits, target_db, features, compute_hash, False)
     extractor.create_features()
 
-    # Cleanup stale entries
+    # Cleanup stale entries (concurrent existence checks hide the latency of network file systems)
     df = api.query(group_by=context + ":local")
-    dfilter = df["local"].apply(lambda x: not x or not os.path.isfile(x))
+    with ThreadPoolExecutor(32) as executor:
+        slices = executor.map(lambda paths: [ not x or not os.path.isfile(x) for x in paths ], slice_iterator(df["local"].to_list(), 256))
+        dfilter = [ stale for stale_slice in slices for stale in stale_slice ]
     missing = df[dfilter]
     if len(missing) and api.verbose:
         for path in missing["local"].tolist():
@@ -180,7 +183,9 @@ def init_local(api: GBD, rlimits, root, target_db):
         api.reset_values("local", values=missing["local"].tolist())
 
     # Create df with paths not yet in local table
-    paths = [ path for suffix in suffixes(context) for path in glob.iglob(root + "/**/*" + suffix, recursive=True) ]
-    df2 = pd.DataFrame([(None, path) for path in paths if not path in df["local"].to_list()], columns=["hash", "local"])
+    paths = list(find_files(root, suffixes(context)))
+    known = set(df["local"].to_list())
+    df2 = pd.DataFrame([(None, path) for path in paths if not path in known], columns=["hash", "local"])
     
-    extractor.run(df2)
\ No newline at end of file
+    extractor.run(df2)
+    api.database.optimize(0x10002)
\ No newline at end of file
@@ -14,6 +14,7 @@
 # copies or substantial portions of the Software.
 
 import io
+import re
 import hashlib
 
 import gzip
@@ -45,31 +46,29 @@ except ImportError:
     try:
         from gbdhashc import gbdhash as cnf_hash
     except ImportError:
+        # a line contributes the integers before its first non-numeric character, e.g., comments and header lines contribute nothing
+        cnf_line_rest = re.compile(rb'[^\x00- 0-9-][^\r\n]*')
+        cnf_token = re.compile(rb'[0-9-]+')
+
         def cnf_hash(filename):
             file = open_file(filename, 'rb')
             buff = io.BufferedReader(file, io.DEFAULT_BUFFER_SIZE * 16)
 
-            space = False
-            skip = False
-            start = True
-            cldelim = True
+            empty = True
+            last = b'0'
             hash_md5 = hashlib.md5()
 
-            for byte in iter(lambda: buff.read(1), b''):
-                if not skip and (byte >= b'0' and byte <= b'9' or byte == b'-'):
-                    cldelim = byte == b'0' and (space or start)
-                    start = False
-                    if space:
-                        space = False
+            # process blocks of complete lines to keep the per-byte work in the regex engine
+            for lines in iter(lambda: buff.readlines(io.DEFAULT_BUFFER_SIZE * 16), []):
+                tokens = cnf_token.findall(cnf_line_rest.sub(b'', b''.join(lines)))
+                if tokens:
+                    if not empty:
                         hash_md5.update(b' ')
-                    hash_md5.update(byte)
-                elif byte <= b' ':
-                    space = not start # remember non-leading space characters 
-                    skip = skip and byte != b'\n' and byte != b'\r' # comment line ended
-                else: #byte == b'c' or byte == b'p':
-                    skip = True  # do not hash comment and header line
-
-            if not cldelim:
+                    hash_md5.update(b' '.join(tokens))
+                    empty = False
+                    last = tokens[-1]
+
+            if last != b'0':
                 hash_md5.update(b' 0')
 
             file.close()
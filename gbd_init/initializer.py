@@ -38,6 +38,7 @@ class Initializer:
         self.initfunc = initfunc
         self.rlimits = rlimits
         self.usepool = usepool
+        self.buffer = [ ]
 
     def prep_data(self, rec, hash):
         return [(key, hash, int(value) if isinstance(value, float) and value.is_integer() else value) for key, value in
@@ -50,31 +51,47 @@ class Initializer:
         self.api.database.commit()
 
 
+    # results are buffered and written in batches of 1000 with one transaction per feature
     def save_features(self, result: list):
-        for attr in result:
-            name, hashv, value = attr[0], attr[1], attr[2]
-            self.api.database.set_values(name, value, [hashv], self.target_db)
+        self.buffer.append(result)
+        if len(self.buffer) >= 1000:
+            self.flush_features()
+
+    def flush_features(self):
+        # take the buffer first such that a failed write is not retried by the final flush
+        buffer, self.buffer = self.buffer, [ ]
+        rows = dict()
+        for result in buffer:
+            for attr in result:
+                name, hashv, value = attr[0], attr[1], attr[2]
+                rows.setdefault(name, []).append((hashv, value))
+        for (name, pairs) in rows.items():
+            self.api.database.insert_values(name, pairs, self.target_db)
         self.api.database.commit()
 
 
     def run(self, instances: pd.DataFrame):
-        if self.rlimits['jobs'] == 1:
-            self.init_sequential(instances)
-        elif self.usepool:
-            self.init_parallel_tp(instances)
-        else:
-            self.init_parallel_pp(instances)
+        with self.api.database.write_ahead_log(self.target_db):
+            try:
+                if self.rlimits['jobs'] == 1:
+                    self.init_sequential(instances)
+                elif self.usepool:
+                    self.init_parallel_tp(instances)
+                else:
+                    self.init_parallel_pp(instances)
+            finally:
+                self.flush_features()
 
     def init_sequential(self, instances: pd.DataFrame):
-        for idx, row in instances.iterrows():
-            result = self.initfunc(row['hash'], row['local'], self.rlimits)
+        for (hash, path) in zip(instances['hash'], instances['local']):
+            result = self.initfunc(hash, path, self.rlimits)
             self.save_features(result)
 
 
     def init_parallel_tp(self, instances: pd.DataFrame):
         tp = gbdc.ThreadPool(self.rlimits['mlim'], self.rlimits['jobs'], self.rlimits['tlim'])
-        for idx, row in instances.iterrows():
-            self.initfunc(row['hash'], row['local'], self.rlimits, tp)
+        for (hash, path) in zip(instances['hash'], instances['local']):
+            self.initfunc(hash, path, self.rlimits, tp)
         n_jobs = len(instances)
         while n_jobs != 0:
             if tp.result_ready():
@@ -90,11 +107,10 @@ class Initializer:
 
     def init_parallel_pp(self, instances: pd.DataFrame):
         with pebble.ProcessPool(max_workers=self.rlimits['jobs'], max_tasks=1, context=multiprocessing.get_context('forkserver')) as p:
-            futures = [ p.schedule(self.initfunc, (row['hash'], row['local'], self.rlimits)) for idx, row in instances.iterrows() ]
+            futures = [ p.schedule(self.initfunc, (hash, path, self.rlimits)) for (hash, path) in zip(instances['hash'], instances['local']) ]
             for f in as_completed(futures):  #, timeout=api.tlim if api.tlim > 0 else None):
                 try:
                     result = f.result()
-                    self.save_features(result)
                 except pebble.ProcessExpired as e:
                     f.cancel()
                     util.eprint("{}: {}".format(e.__class__.__name__, e))
@@ -104,4 +120,7 @@ class Initializer:
                     import traceback
                     traceback.print_exc()
                     util.eprint("{}: {}".format(e.__class__.__name__, e))
+                else:
+                    # write errors (e.g., of a buffer flush) are not specific to the instance and must propagate
+                    self.save_features(result)
 
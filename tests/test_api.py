@@ -21,10 +21,9 @@ class APITestCase(unittest.TestCase):
         return super().setUp()
 
     def tearDown(self) -> None:
-        if os.path.exists(self.file1):
-            os.remove(self.file1)
-        if os.path.exists(self.file2):
-            os.remove(self.file2)
+        self.api.database.close()
+        util.remove_database(self.file1)
+        util.remove_database(self.file2)
         return super().tearDown()
 
     def test_databases_exist(self):
@@ -28,8 +28,8 @@ class DatabaseTestCase(unittest.TestCase):
         return super().setUp()
 
     def tearDown(self) -> None:
-        if os.path.exists(self.file):
-            os.remove(self.file)
+        self.db.close()
+        util.remove_database(self.file)
         return super().tearDown()
 
     def query(self, feat, val):
@@ -1,6 +1,11 @@
 import unittest
 import random
 import os
+import string
+import sys
+import importlib.util
+
+from unittest import mock
 
 from gbd_core.contexts import identify
 from tests import util
@@ -65,3 +70,38 @@ class TestGBDHash(unittest.TestCase):
                 os.remove(var_file)
 
             self.assertEqual(self.reference_hash, variant_hash)
+
+    def get_printable_comment(self, p=0.5):
+        text = ''.join(random.choice(string.ascii_letters + string.digits + ' -') for _ in range(random.randint(0, 20)))
+        return "c {}\n".format(text) if random.random() < p else ""
+
+    def load_fallback_hash(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gbd_init", "gbdhash.py")
+        spec = importlib.util.spec_from_file_location("gbdhash_fallback", path)
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(sys.modules, { 'gbdc': None, 'gbdhashc': None }):
+            spec.loader.exec_module(module)
+        return module.cnf_hash
+
+    def test_fallback_hash(self):
+        try:
+            from gbdc import gbdhash
+        except ImportError:
+            self.skipTest("gbdc not installed")
+        fallback_hash = self.load_fallback_hash()
+        self.assertIsNot(fallback_hash, gbdhash)
+        var_file = "variant.cnf"
+        for i in range(100):
+            variant = self.get_printable_comment() + self.get_random_header(1)
+            for clause in util.get_random_formula().splitlines():
+                variant += self.get_printable_comment(0.2) + clause + "\n"
+            # gbdc drops a trailing empty clause without newline after comments or header, the python hash keeps it
+            variant += "1 -2 0\n"
+            if i % 2:
+                variant = variant.replace("\n", "\r\n")
+            if i % 3 == 0:
+                variant = variant.rstrip("\r\n")
+            with open(var_file, 'w', newline='') as f:
+                f.write(variant)
+            self.assertEqual(gbdhash(var_file), fallback_hash(var_file))
+        os.remove(var_file)
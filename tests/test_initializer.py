@@ -5,6 +5,8 @@ import pandas as pd
 import random
 import sqlite3
 
+from unittest import mock
+
 from gbd_core.database import Database
 from gbd_core.schema import Schema
 from gbd_core.api import GBD, GBDException
@@ -14,6 +16,10 @@ from gbd_init.feature_extractors import init_local, init_features_generic, gener
 
 from tests import util
 
+# module level such that it can be pickled for the process pool
+def init_random(hash, path, limits):
+    return [ ('random', hash, random.randint(1, 1000)) ]
+
 class InitTestCase(unittest.TestCase):
 
     def setUp(self) -> None:
@@ -29,8 +35,8 @@ class InitTestCase(unittest.TestCase):
         return super().setUp()
 
     def tearDown(self) -> None:
-        if os.path.exists(self.file):
-            os.remove(self.file)
+        self.db.close()
+        util.remove_database(self.file)
         if os.path.exists(self.benchmark):
             os.remove(self.benchmark)
         return super().tearDown()
@@ -49,6 +55,58 @@ class InitTestCase(unittest.TestCase):
         df = api.query("random > 0", [], ["random"])
         self.assertEqual(len(df.index), 100)
 
+    def test_init_random_batches(self):
+        api = GBD([self.file], verbose=False)
+        rlimits = { 'jobs': 1, 'tlim': 5000, 'mlim': 2000, 'flim': 1000 }
+        init = Initializer(api, rlimits, self.name, [('random', 0)], self.init_random)
+        init.create_features()
+        df = pd.DataFrame([(str(n), None) for n in range(2500)], columns=["hash", "local"])
+        with mock.patch.object(api.database, 'insert_values', wraps=api.database.insert_values) as insert:
+            init.run(df)
+        self.assertEqual([ len(call.args[1]) for call in insert.call_args_list ], [ 1000, 1000, 500 ])
+        df = api.query("random > 0", [], ["random"])
+        self.assertEqual(len(df.index), 2500)
+
+    def test_init_random_failure(self):
+        api = GBD([self.file], verbose=False)
+        rlimits = { 'jobs': 1, 'tlim': 5000, 'mlim': 2000, 'flim': 1000 }
+        def init_failing(hash, path, limits):
+            if int(hash) == 50:
+                raise RuntimeError("extraction failed")
+            return self.init_random(hash, path, limits)
+        init = Initializer(api, rlimits, self.name, [('random', 0)], init_failing)
+        init.create_features()
+        df = pd.DataFrame([(str(n), None) for n in range(100)], columns=["hash", "local"])
+        with self.assertRaisesRegex(RuntimeError, "extraction failed"):
+            init.run(df)
+        # results completed before the failure are flushed
+        df = api.query("random > 0", [], ["random"])
+        self.assertEqual(len(df.index), 50)
+
+    def test_init_random_flush_failure(self):
+        api = GBD([self.file], verbose=False)
+        rlimits = { 'jobs': 1, 'tlim': 5000, 'mlim': 2000, 'flim': 1000 }
+        init = Initializer(api, rlimits, self.name, [('random', 0)], self.init_random)
+        init.create_features()
+        df = pd.DataFrame([(str(n), None) for n in range(1500)], columns=["hash", "local"])
+        with mock.patch.object(api.database, 'insert_values', side_effect=sqlite3.OperationalError("disk I/O error")) as insert:
+            with self.assertRaisesRegex(sqlite3.OperationalError, "disk I/O error"):
+                init.run(df)
+        # the failed batch is not retried by the final flush
+        self.assertEqual(insert.call_count, 1)
+        self.assertEqual(init.buffer, [ ])
+
+    def test_init_random_flush_failure_pool(self):
+        api = GBD([self.file], verbose=False)
+        rlimits = { 'jobs': 2, 'tlim': 5000, 'mlim': 2000, 'flim': 1000 }
+        init = Initializer(api, rlimits, self.name, [('random', 0)], init_random)
+        init.create_features()
+        df = pd.DataFrame([(str(n), None) for n in range(4)], columns=["hash", "local"])
+        # write errors propagate from the process pool like in sequential mode (instead of being reported per instance)
+        with mock.patch.object(init, 'save_features', side_effect=sqlite3.OperationalError("disk I/O error")):
+            with self.assertRaisesRegex(sqlite3.OperationalError, "disk I/O error"):
+                init.run(df)
+
     def test_init_local(self):
         api = GBD([self.file], verbose=False)
         rlimits = { 'jobs': 1, 'tlim': 5000, 'mlim': 2000, 'flim': 1000 }
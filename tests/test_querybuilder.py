@@ -43,10 +43,9 @@ class QueryNonUniqueTestCase(unittest.TestCase):
         return super().setUp()
 
     def tearDown(self) -> None:
-        if os.path.exists(self.file1):
-            os.remove(self.file1)
-        if os.path.exists(self.file2):
-            os.remove(self.file2)
+        self.db.close()
+        util.remove_database(self.file1)
+        util.remove_database(self.file2)
         return super().tearDown()
     
     def simple_query(self, feat, val, dbname=None):
@@ -20,8 +20,8 @@ class SchemaTestCase(unittest.TestCase):
         return super().setUp()
 
     def tearDown(self) -> None:
-        if os.path.exists(self.file):
-            os.remove(self.file)
+        self.db.close()
+        util.remove_database(self.file)
         return super().tearDown()
 
     def test_create_db(self):
@@ -50,4 +50,75 @@ class SchemaTestCase(unittest.TestCase):
         self.assertEqual(finfo.column, "value")
         self.assertEqual(finfo.default, None)
         self.assertEqual(finfo.database, self.name)
+        con = sqlite3.connect(self.file)
+        plan = con.execute("EXPLAIN QUERY PLAN SELECT hash FROM {} WHERE value = 'x'".format(FEAT)).fetchall()
+        con.close()
+        self.assertIn("INDEX {}_value".format(FEAT), plan[0][-1])
 
+    def test_create_nonunique_feature_permissive(self):
+        FEAT = "featE"
+        self.db.create_feature(FEAT, default_value=None)
+        self.db.close()
+        # simulate a database created before the value index was introduced
+        con = sqlite3.connect(self.file)
+        con.execute("DROP INDEX {}_value".format(FEAT))
+        con.commit()
+        plan = con.execute("EXPLAIN QUERY PLAN SELECT hash FROM {} WHERE value = 'x'".format(FEAT)).fetchall()
+        self.assertNotIn("INDEX {}_value".format(FEAT), plan[0][-1])
+        con.close()
+        self.db = Database([self.file], verbose=False)
+        self.db.create_feature(FEAT, default_value=None, permissive=True)
+        con = sqlite3.connect(self.file)
+        plan = con.execute("EXPLAIN QUERY PLAN SELECT hash FROM {} WHERE value = 'x'".format(FEAT)).fetchall()
+        con.close()
+        self.assertIn("INDEX {}_value".format(FEAT), plan[0][-1])
+
+
+    def test_create_from_csv(self):
+        csvfile = util.get_random_unique_filename('test', '.csv')
+        with open(csvfile, 'w') as f:
+            f.write("hash,family\n")
+            f.write("a,\"o'brien\"\n")
+            f.write("b,crypto\n")
+        try:
+            schema = Schema.create(csvfile)
+            self.assertTrue(schema.is_in_memory())
+            self.assertIn("family", schema.features)
+            rows = schema.dbcon.execute("SELECT hash, family FROM features ORDER BY hash").fetchall()
+            self.assertEqual(rows, [ ("a", "o'brien"), ("b", "crypto") ])
+        finally:
+            os.remove(csvfile)
+
+    def test_journal_mode(self):
+        con = sqlite3.connect(self.file)
+        con.execute("BEGIN")
+        con.execute("SELECT * FROM sqlite_master").fetchall()
+        try:
+            # opening and querying must not block on concurrent readers
+            with Database([self.file], verbose=False) as db:
+                self.assertEqual(db.query("PRAGMA {}.journal_mode".format(self.name)), [ ("delete", ) ])
+                self.assertIsNotNone(db.query("SELECT * FROM {}.sqlite_master".format(self.name)))
+                # busy database falls back to its journal mode
+                with db.write_ahead_log(self.name):
+                    self.assertEqual(db.query("PRAGMA {}.journal_mode".format(self.name)), [ ("delete", ) ])
+        finally:
+            con.rollback()
+        with Database([self.file], verbose=False) as db:
+            with db.write_ahead_log(self.name):
+                self.assertEqual(db.query("PRAGMA {}.journal_mode".format(self.name)), [ ("wal", ) ])
+                db.create_feature("featC", default_value="empty")
+            self.assertEqual(db.query("PRAGMA {}.journal_mode".format(self.name)), [ ("delete", ) ])
+        self.assertEqual(con.execute("PRAGMA journal_mode").fetchall(), [ ("delete", ) ])
+        con.close()
+        self.assertFalse(os.path.exists(self.file + "-wal"))
+
+    def test_attach_path_with_quote(self):
+        file = util.get_random_unique_filename("test'quote", '.db')
+        sqlite3.connect(file).close()
+        try:
+            with Database([file], verbose=False) as db:
+                self.assertTrue(db.dexists(Schema.dbname_from_path(file)))
+                db.create_feature("featD", default_value="empty")
+                self.assertIn("featD", db.get_features())
+        finally:
+            util.remove_database(file)
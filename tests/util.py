@@ -13,6 +13,11 @@ def get_random_unique_filename(prefix='random', suffix='.cnf'):
         filename = '{}{}{}'.format(prefix, random.randint(0, 1000), suffix)
     return filename
 
+def remove_database(path):
+    for file in [ path, path + '-wal', path + '-shm', path + '-journal' ]:
+        if os.path.exists(file):
+            os.remove(file)
+
 def get_random_cnffile(max_num=50):
     filename = get_random_unique_filename()
     with open(filename, 'w') as f: